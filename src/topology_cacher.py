@@ -18,17 +18,30 @@ things easier to read (and was easier to implement).
 
 """
 from argparse import ArgumentParser
-from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 import json
 import logging
 import os
 import sys
-import xml.etree.ElementTree as ET
+from xml.etree import ElementTree
 
+# lxml is only used for the project data; the rgsummary scan visits every
+# element, and lxml's per-element proxy objects make that slower than with
+# the standard library
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from urllib.request import urlopen
 
-from typing import Optional
+from typing import Optional, Tuple
 
 
 TOPOLOGY = "https://topology.opensciencegrid.org"
@@ -37,19 +50,70 @@ TOPOLOGY = "https://topology.opensciencegrid.org"
 log = logging.getLogger(__name__)
 
 
+def _compile_path(path: str):
+    """Return a callable that returns the list of elements matching `path` under
+    the element it's given: a precompiled XPath if lxml is in use, or a wrapper
+    around findall() otherwise.
+
+    """
+    if hasattr(ET, "XPath"):
+        return ET.XPath(path)
+    return lambda element: element.findall(path)
+
+
+_XP_PROJECT = _compile_path("./Project")
+_XP_NAME = _compile_path("./Name")
+_XP_RESOURCE_ALLOCATION = _compile_path("./ResourceAllocations/ResourceAllocation")
+_XP_TYPE = _compile_path("./Type")
+_XP_EXECUTE_RESOURCE_GROUP = _compile_path(
+    "./ExecuteResourceGroups/ExecuteResourceGroup"
+)
+_XP_SUBMIT_RESOURCE = _compile_path("./SubmitResources/SubmitResource")
+_XP_GROUP_NAME = _compile_path("./GroupName")
+_XP_LOCAL_ALLOCATION_ID = _compile_path("./LocalAllocationID")
+
+
 class DataError(Exception):
     pass
 
 
-class ResourceInfo(namedtuple("ResourceInfo", "group_name name fqdn service_ids tags")):
-    SERVICE_ID_CE = "1"
-    SERVICE_ID_SCHEDD = "109"
+SERVICE_ID_CE = "1"
+SERVICE_ID_SCHEDD = "109"
+
+
+class ResourceInfo:
+    __slots__ = ("group_name", "name", "fqdn", "service_ids", "tags")
+
+    SERVICE_ID_CE = SERVICE_ID_CE
+    SERVICE_ID_SCHEDD = SERVICE_ID_SCHEDD
+
+    def __init__(self, group_name, name, fqdn, service_ids, tags):
+        self.group_name = group_name
+        self.name = name
+        self.fqdn = fqdn
+        self.service_ids = service_ids
+        self.tags = tags
+
+    def __repr__(self):
+        return (
+            "ResourceInfo(group_name=%r, name=%r, fqdn=%r, service_ids=%r, tags=%r)"
+            % (self.group_name, self.name, self.fqdn, self.service_ids, self.tags)
+        )
+
+    def _asdict(self):
+        return {
+            "group_name": self.group_name,
+            "name": self.name,
+            "fqdn": self.fqdn,
+            "service_ids": self.service_ids,
+            "tags": self.tags,
+        }
 
     def is_ce(self):
-        return self.SERVICE_ID_CE in self.service_ids
+        return SERVICE_ID_CE in self.service_ids
 
     def is_schedd(self):
-        return self.SERVICE_ID_SCHEDD in self.service_ids
+        return SERVICE_ID_SCHEDD in self.service_ids
 
 
 class TopologyData:
@@ -64,48 +128,26 @@ class TopologyData:
         self.grouped_resinfo = {}
         self.resinfo_by_name = {}
         self.resinfo_by_fqdn = {}
+        self.ces_by_group = {}
+        self.submit_dict_by_name = {}
         self.projects = None
-        self.resources = None
-        self.update_projects()
-        self.update_resources()
+        self.projects_xml = None
+        self.resources_xml = None
+
+        # The two downloads are independent; run them concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            projects_future = executor.submit(self._get_data, "/miscproject/xml")
+            resources_future = executor.submit(self._get_raw_data, "/rgsummary/xml")
+            self.projects_xml, self.projects = projects_future.result()
+            self.resources_xml = resources_future.result()
+        self._index_resources()
 
     def update_projects(self):
-        self.projects = self._get_data("/miscproject/xml")
+        self.projects_xml, self.projects = self._get_data("/miscproject/xml")
 
     def update_resources(self):
-        self.resources = self._get_data("/rgsummary/xml")
-        self.resinfo_table = []
-        self.grouped_resinfo = {}
-        self.resinfo_by_name = {}
-        self.resinfo_by_fqdn = {}
-
-        #
-        # Build tables and indices for easier lookup
-        #
-        for eResourceGroup in self.resources.findall("./ResourceGroup"):
-            group_name = safe_element_text(eResourceGroup.find("./GroupName"))
-            if not group_name:
-                log.warning(
-                    "Skipping malformed ResourceGroup: %s", elem2str(eResourceGroup)
-                )
-                continue
-            self.grouped_resinfo[group_name] = []
-
-            for eResource in eResourceGroup.findall("./Resources/Resource"):
-                resource_name = safe_element_text(eResource.find("./Name"))
-                fqdn = safe_element_text(eResource.find("./FQDN"))
-                service_ids = findall_nonempty(eResource, "./Services/Service/ID")
-                if not resource_name or not fqdn or not service_ids:
-                    log.warning("Skipping malformed Resource: %s", elem2str(eResource))
-                    continue
-                tags = findall_nonempty(eResource, "./Tags/Tag")
-                resinfo = ResourceInfo(
-                    group_name, resource_name, fqdn, service_ids, tags
-                )
-                self.resinfo_table.append(resinfo)
-                self.grouped_resinfo[group_name].append(resinfo)
-                self.resinfo_by_name[resource_name] = resinfo
-                self.resinfo_by_fqdn[fqdn] = resinfo
+        self.resources_xml = self._get_raw_data("/rgsummary/xml")
+        self._index_resources()
 
     def get_resource_info_lookups(self):
         """Return a dict with 3 items (intended to go into a single .json file):
@@ -129,11 +171,18 @@ class TopologyData:
 
         """
 
+        # Convert each ResourceInfo once; the three lookups share the same dicts.
+        # resinfo_dicts parallels self.resinfo_table, which is in the same order
+        # that resinfo_by_name and resinfo_by_fqdn were filled in, so the name
+        # and fqdn lookups can be rebuilt straight from it.
+        resinfo_dicts = [x._asdict() for x in self.resinfo_table]
+        dict_by_id = dict(zip(map(id, self.resinfo_table), resinfo_dicts))
+
         resource_lists_by_group = {}
         for group, resinfo_list in self.grouped_resinfo.items():
-            resource_lists_by_group[group] = [x._asdict() for x in resinfo_list]
-        resources_by_name = {k: v._asdict() for k, v in self.resinfo_by_name.items()}
-        resources_by_fqdn = {k: v._asdict() for k, v in self.resinfo_by_fqdn.items()}
+            resource_lists_by_group[group] = [dict_by_id[id(x)] for x in resinfo_list]
+        resources_by_name = {d["name"]: d for d in resinfo_dicts}
+        resources_by_fqdn = {d["fqdn"]: d for d in resinfo_dicts}
         return {
             "resource_lists_by_group": resource_lists_by_group,
             "resources_by_name": resources_by_name,
@@ -141,95 +190,89 @@ class TopologyData:
         }
 
     def get_project_resource_allocations(self):
-        """Combines projects data (from self.projects) and resource data (from self.resources)
-        into a dict keyed by Project Name; see README.md for the full format.
+        """Combines projects data (from self.projects) and resource data (from the tables
+        built by update_resources()) into a dict keyed by Project Name; see README.md for the full format.
+
+        The "ces" lists and "submit_resources" entries are shared by every
+        allocation that refers to the same resource group or resource;
+        copy them before modifying.
 
         """
-        if not self.projects or not self.resources:
+        if self.projects is None or len(self.projects) == 0:
             return {}
 
         ret = {}
-        for eProject in self.projects.findall("./Project"):
-            project_name = safe_element_text(eProject.find("./Name"))
+        for eProject in _XP_PROJECT(self.projects):
+            project_name = path_text(_XP_NAME, eProject)
             if not project_name:
                 log.warning(
-                    "Project has a missing or empty Name: %s", elem2str(eProject)
+                    "Project has a missing or empty Name: %s", _LazyElem2Str(eProject)
                 )
                 continue
 
             ret[project_name] = allocations = []
-            for eResourceAllocation in eProject.findall(
-                "./ResourceAllocations/ResourceAllocation"
-            ):
-                bad_ra = False
-                allocation = {}
-
+            for eResourceAllocation in _XP_RESOURCE_ALLOCATION(eProject):
                 #
-                # Get ResourceAllocation elements and verify they're nonempty
+                # Get ResourceAllocation elements and verify they're nonempty;
+                # skip the allocation at the first one that isn't
                 #
-                type_ = safe_element_text(eResourceAllocation.find("./Type"))
-                eExecuteResourceGroup_list = eResourceAllocation.findall(
-                    "./ExecuteResourceGroups/ExecuteResourceGroup"
-                )
-                eSubmitResource_list = eResourceAllocation.findall(
-                    "./SubmitResources/SubmitResource"
+                type_ = path_text(_XP_TYPE, eResourceAllocation)
+                if not type_:
+                    log.warning(
+                        "ResourceAllocation has a missing or empty Type: %s",
+                        _LazyElem2Str(eResourceAllocation),
+                    )
+                    continue
+                eExecuteResourceGroup_list = _XP_EXECUTE_RESOURCE_GROUP(
+                    eResourceAllocation
                 )
-                for var, name in [
-                    (type_, "Type"),
-                    (eExecuteResourceGroup_list, "ExecuteResourceGroups"),
-                    (eSubmitResource_list, "SubmitResources"),
-                ]:
-                    if not var:
-                        log.warning(
-                            "ResourceAllocation has a missing or empty %s: %s",
-                            name,
-                            elem2str(eResourceAllocation),
-                        )
-                        bad_ra = True
-
-                if bad_ra:
+                if not eExecuteResourceGroup_list:
+                    log.warning(
+                        "ResourceAllocation has a missing or empty "
+                        "ExecuteResourceGroups: %s",
+                        _LazyElem2Str(eResourceAllocation),
+                    )
+                    continue
+                eSubmitResource_list = _XP_SUBMIT_RESOURCE(eResourceAllocation)
+                if not eSubmitResource_list:
+                    log.warning(
+                        "ResourceAllocation has a missing or empty SubmitResources: %s",
+                        _LazyElem2Str(eResourceAllocation),
+                    )
                     continue
 
-                allocation["type"] = type_
+                allocation = {"type": type_}
 
                 #
                 # Transform the list of SubmitResource elements
                 #
                 allocation["submit_resources"] = []
                 for eSubmitResource in eSubmitResource_list:
-                    resinfo = self.resinfo_by_name.get(
+                    submit_resource = self.submit_dict_by_name.get(
                         safe_element_text(eSubmitResource)
                     )
-                    if not resinfo:
+                    if not submit_resource:
                         log.warning(
                             "Skipping missing or malformed SubmitResource: %s",
-                            elem2str(eSubmitResource),
+                            _LazyElem2Str(eSubmitResource),
                         )
                         continue
 
-                    allocation["submit_resources"].append(
-                        {
-                            "fqdn": resinfo.fqdn,
-                            "group_name": resinfo.group_name,
-                            "name": resinfo.name,
-                        }
-                    )
+                    allocation["submit_resources"].append(submit_resource)
 
                 #
                 # Transform the list of ExecuteResourceGroup elements
                 #
                 allocation["execute_resource_groups"] = []
                 for eExecuteResourceGroup in eExecuteResourceGroup_list:
-                    group_name = safe_element_text(
-                        eExecuteResourceGroup.find("./GroupName")
-                    )
-                    local_allocation_id = safe_element_text(
-                        eExecuteResourceGroup.find("./LocalAllocationID")
+                    group_name = path_text(_XP_GROUP_NAME, eExecuteResourceGroup)
+                    local_allocation_id = path_text(
+                        _XP_LOCAL_ALLOCATION_ID, eExecuteResourceGroup
                     )
                     if not group_name or not local_allocation_id:
                         log.warning(
                             "Skipping malformed ExecuteResourceGroup: %s",
-                            elem2str(eExecuteResourceGroup),
+                            _LazyElem2Str(eExecuteResourceGroup),
                         )
                         continue
 
@@ -241,11 +284,7 @@ class TopologyData:
                         )
                         continue
 
-                    ces = [
-                        {"fqdn": x.fqdn, "name": x.name}
-                        for x in resinfo_list
-                        if x.is_ce()
-                    ]
+                    ces = self.ces_by_group[group_name]
                     allocation["execute_resource_groups"].append(
                         {
                             "ces": ces,
@@ -266,11 +305,74 @@ class TopologyData:
     #
     #
 
-    def _get_data(self, endpoint: str) -> ET.Element:
-        """Download XML topology data from from `endpoint` and parse it as an ET.Element.
-        `endpoint` is a path under the topology host, e.g. "/miscproject/xml".
+    def _index_resources(self):
+        """Build the ResourceInfo tables and indices from self.resources_xml."""
+        self.resinfo_table = []
+        self.grouped_resinfo = {}
+        self.resinfo_by_name = {}
+        self.resinfo_by_fqdn = {}
+        self.ces_by_group = {}
+        self.submit_dict_by_name = {}
 
-        Returns the parsed data.
+        # Local names for the loop below, which runs once per resource
+        table_append = self.resinfo_table.append
+        grouped_resinfo = self.grouped_resinfo
+        resinfo_by_name = self.resinfo_by_name
+        resinfo_by_fqdn = self.resinfo_by_fqdn
+        resource_info = ResourceInfo
+        scan_resource = _scan_resource
+
+        #
+        # Build tables and indices for easier lookup.  The document is parsed
+        # incrementally so only one ResourceGroup is in memory at a time.
+        #
+        for eResourceGroup in self._iterparse_children(
+            self.resources_xml, "ResourceGroup", "/rgsummary/xml"
+        ):
+            group_name, eResource_list = _scan_resource_group(eResourceGroup)
+            if not group_name:
+                log.warning(
+                    "Skipping malformed ResourceGroup: %s",
+                    _LazyElem2Str(eResourceGroup),
+                )
+                continue
+            group_name = sys.intern(group_name)
+            grouped_resinfo[group_name] = group_list = []
+            group_append = group_list.append
+
+            for eResource in eResource_list:
+                resource_name, fqdn, service_ids, tags = scan_resource(eResource)
+                if not resource_name or not fqdn or not service_ids:
+                    log.warning(
+                        "Skipping malformed Resource: %s", _LazyElem2Str(eResource)
+                    )
+                    continue
+                resinfo = resource_info(
+                    group_name, resource_name, fqdn, service_ids, tags
+                )
+                table_append(resinfo)
+                group_append(resinfo)
+                resinfo_by_name[resource_name] = resinfo
+                resinfo_by_fqdn[fqdn] = resinfo
+
+        # The CEs of a group are listed for every allocation that uses the group
+        self.ces_by_group = {
+            group_name: [
+                {"fqdn": x.fqdn, "name": x.name} for x in resinfo_list if x.is_ce()
+            ]
+            for group_name, resinfo_list in grouped_resinfo.items()
+        }
+        # Likewise, a submit resource is listed for every allocation that uses it
+        self.submit_dict_by_name = {
+            name: {"fqdn": x.fqdn, "group_name": x.group_name, "name": x.name}
+            for name, x in resinfo_by_name.items()
+        }
+
+    def _get_raw_data(self, endpoint: str) -> bytes:
+        """Download XML topology data from `endpoint` without parsing it.
+        `endpoint` is a path under the topology host, e.g. "/rgsummary/xml".
+
+        Returns the raw bytes.
 
         """
         try:
@@ -282,29 +384,174 @@ class TopologyData:
         if not xml_bytes:
             raise DataError("Topology query to %s returned no data" % endpoint)
 
+        return xml_bytes
+
+    def _get_data(self, endpoint: str) -> Tuple[bytes, ET.Element]:
+        """Download XML topology data from from `endpoint` and parse it as an ET.Element.
+        `endpoint` is a path under the topology host, e.g. "/miscproject/xml".
+
+        Returns the raw bytes and the parsed data.
+
+        """
+        xml_bytes = self._get_raw_data(endpoint)
+
         try:
             element = ET.fromstring(xml_bytes)
         except (ET.ParseError, UnicodeDecodeError) as err:
+            # ^^ lxml's XMLSyntaxError is a subclass of its ParseError
             raise DataError(
                 "Topology query to %s couldn't be parsed" % endpoint
             ) from err
 
-        return element
+        return xml_bytes, element
+
+    def _iterparse_children(self, xml_bytes: bytes, tag: str, endpoint: str):
+        """Incrementally parse `xml_bytes`, yielding each child of the root element
+        named `tag`.  Each child is cleared and dropped from the tree once the caller
+        is done with it, so memory use is bounded by the size of a single child.
+        `endpoint` is only used for error messages.
+
+        Always uses the standard library's ElementTree, even if lxml is available.
+
+        """
+        root = None
+        depth = 0
+        try:
+            for event, element in ElementTree.iterparse(
+                BytesIO(xml_bytes), events=("start", "end")
+            ):
+                if event == "start":
+                    if root is None:
+                        root = element
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth != 1:
+                    continue
+                if element.tag == tag:
+                    yield element
+                element.clear()
+                del root[:-1]
+        except (ElementTree.ParseError, UnicodeDecodeError) as err:
+            raise DataError(
+                "Topology query to %s couldn't be parsed" % endpoint
+            ) from err
 
 
 def safe_element_text(element: Optional[ET.Element]) -> str:
     return getattr(element, "text", "").strip()
 
 
-def findall_nonempty(elt, path):
-    return list(filter(None, map(safe_element_text, elt.findall(path))))
+def path_text(xpath, element: ET.Element) -> str:
+    """Return the stripped text of the first match of the compiled path `xpath`
+    (see _compile_path()) under `element`, or "" if there is none.
+
+    """
+    found = xpath(element)
+    return safe_element_text(found[0]) if found else ""
+
+
+def _scan_resource_group(eResourceGroup):
+    """Walk the children of a ResourceGroup element once, returning its
+    GroupName text and the list of its Resources/Resource elements.
+
+    """
+    group_name = ""
+    eResource_list = []
+    for child in eResourceGroup:
+        if child.tag == "GroupName":
+            group_name = (child.text or "").strip()
+        elif child.tag == "Resources":
+            eResource_list.extend(x for x in child if x.tag == "Resource")
+    return group_name, eResource_list
+
+
+def _scan_resource(eResource):
+    """Walk the children of a Resource element once, returning its Name and
+    FQDN texts and tuples of the nonempty texts of its Services/Service/ID and
+    Tags/Tag elements.  Service IDs and tags come from a small vocabulary, so
+    they are interned to share one string object per distinct value.
+
+    """
+    intern = sys.intern
+    name = fqdn = ""
+    service_ids = []
+    tags = []
+    for child in eResource:
+        tag = child.tag
+        if tag == "Name":
+            name = (child.text or "").strip()
+        elif tag == "FQDN":
+            fqdn = (child.text or "").strip()
+        elif tag == "Services":
+            for eService in child:
+                if eService.tag != "Service":
+                    continue
+                for eID in eService:
+                    if eID.tag == "ID":
+                        text = (eID.text or "").strip()
+                        if text:
+                            service_ids.append(intern(text))
+        elif tag == "Tags":
+            for eTag in child:
+                if eTag.tag == "Tag":
+                    text = (eTag.text or "").strip()
+                    if text:
+                        tags.append(intern(text))
+    return name, fqdn, tuple(service_ids), tuple(tags)
 
 
 def elem2str(element: ET.Element) -> str:
+    if isinstance(element, ElementTree.Element):
+        return ElementTree.tostring(element, encoding="unicode")
     return ET.tostring(element, encoding="unicode")
     # ^^ 'encoding="unicode"' tells ET.tostring() to return an str not a bytes
 
 
+class _LazyElem2Str:
+    """Wrapper that defers elem2str() until the object is formatted, e.g. when
+    a log record is actually emitted, so suppressed log messages don't pay for
+    serializing the element.
+
+    """
+
+    __slots__ = ("element",)
+
+    def __init__(self, element: ET.Element):
+        self.element = element
+
+    def __str__(self):
+        return elem2str(self.element)
+
+
+def write_json(path: str, contents):
+    """Write `contents` to `path` as indented JSON with sorted keys, using
+    orjson if it's available and the json module otherwise.
+
+    """
+    if orjson:
+        with open(path, "wb") as fh:
+            fh.write(
+                orjson.dumps(
+                    contents, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+                )
+            )
+    else:
+        # json.dumps() + a single write() is much faster than json.dump(),
+        # which calls fh.write() for every token.  ensure_ascii=False skips
+        # escaping non-ASCII characters; the file is UTF-8, as with orjson.
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(
+                json.dumps(
+                    contents,
+                    skipkeys=True,
+                    indent=2,
+                    sort_keys=True,
+                    ensure_ascii=False,
+                )
+            )
+
+
 def between(value, minimum, maximum):
     return max(minimum, min(maximum, value))
 
@@ -350,16 +597,16 @@ def main(argv):
 
     data = TopologyData(args.topology)
 
-    # Save the raw data
+    # Save the raw data as downloaded
     path = ""
     try:
         for filename, contents in [
-            ("miscproject.xml", data.projects),
-            ("rgsummary.xml", data.resources),
+            ("miscproject.xml", data.projects_xml),
+            ("rgsummary.xml", data.resources_xml),
         ]:
             path = os.path.join(args.outdir, filename)
-            with open(path, "w", encoding="utf-8") as fh:
-                fh.write(elem2str(contents))
+            with open(path, "wb") as fh:
+                fh.write(contents)
                 log.info("Wrote %s", path)
     except OSError as e:
         return f"Couldn't write {path}: {str(e)}"
@@ -373,15 +620,8 @@ def main(argv):
     ]:
         path = os.path.join(args.outdir, filename)
         try:
-            with open(path, "w", encoding="utf-8") as fh:
-                json.dump(
-                    contents,
-                    fh,
-                    skipkeys=True,
-                    indent=2,
-                    sort_keys=True,
-                )
-                log.info("Wrote %s", path)
+            write_json(path, contents)
+            log.info("Wrote %s", path)
         except OSError as e:
             return f"Couldn't write {path}: {str(e)}"
 